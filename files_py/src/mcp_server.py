@@ -6,18 +6,28 @@ tools and resources for interacting with the Elastic Path Files API.
 """
 
 import asyncio
+import base64
 import json
+import logging
 import os
-from datetime import datetime, timedelta
-from typing import Any, Dict, Optional
+import random
+import time
+from email.utils import parsedate_to_datetime
+from types import MappingProxyType
+from typing import Any, Dict, Mapping, Optional
 
 import httpx
-from dotenv import load_dotenv
 from mcp.server.fastmcp import FastMCP
 from mcp.server.fastmcp.server import Context
+from mcp.types import BlobResourceContents, EmbeddedResource
 
-# Load environment variables
-load_dotenv()
+logger = logging.getLogger(__name__)
+
+# Load environment variables; deployments that set them directly can skip
+# the .env lookup with SKIP_DOTENV=1
+if os.getenv("SKIP_DOTENV") != "1":
+    from dotenv import load_dotenv
+    load_dotenv()
 
 # Initialize MCP server
 mcp = FastMCP("elastic-path-files-api")
@@ -28,14 +38,201 @@ API_VERSION = "v2"
 CLIENT_ID = os.getenv("CLIENT_ID", "")
 CLIENT_SECRET = os.getenv("CLIENT_SECRET", "")
 DISABLE_AUTH = os.getenv("DISABLE_AUTH", "False").lower() == "true"
+MAX_DOWNLOAD_SIZE = int(os.getenv("MAX_DOWNLOAD_SIZE", str(50 * 1024 * 1024)))
+DOWNLOAD_CHUNK_SIZE = 64 * 1024
+
+FILES_URL = f"{BASE_URL}/{API_VERSION}/files"
+# Query parameter names for the list_files filters, in argument order
+FILTER_PARAMS = (
+    "filter[name]",
+    "filter[width]",
+    "filter[height]",
+    "filter[file_size]",
+)
+
+# Shared HTTP client: every call to the Elastic Path API goes through the same
+# connection pool so keep-alive connections are reused across tool calls.
+# All traffic targets a single host, so HTTP/2 lets concurrent requests
+# multiplex over one connection instead of opening one each.
+HTTP_TIMEOUT = httpx.Timeout(5.0, connect=2.0)
+HTTP_LIMITS = httpx.Limits(
+    max_connections=100,
+    max_keepalive_connections=32,
+    keepalive_expiry=60.0,
+)
+
+# Client-side rate limiting so bursts stay under the Elastic Path quota
+# instead of turning into 429 responses
+RATE_LIMIT_CAPACITY = float(os.getenv("RATE_LIMIT_CAPACITY", "300"))
+RATE_LIMIT_REFILL_RATE = float(os.getenv("RATE_LIMIT_REFILL_RATE", "5.0"))
+RATE_LIMIT_MAX_RETRIES = int(os.getenv("RATE_LIMIT_MAX_RETRIES", "3"))
+RATE_LIMIT_MAX_DELAY = float(os.getenv("RATE_LIMIT_MAX_DELAY", "30"))
+RATE_LIMIT_BACKOFF = 0.5  # seconds, doubled on every retry without Retry-After
+
+if RATE_LIMIT_CAPACITY < 1:
+    raise ValueError("RATE_LIMIT_CAPACITY must be at least 1")
+if RATE_LIMIT_REFILL_RATE <= 0:
+    raise ValueError("RATE_LIMIT_REFILL_RATE must be greater than 0")
+
+_http_client: Optional[httpx.AsyncClient] = None
+# Loop the shared client was created on; its pooled connections belong to it
+_http_client_loop: Optional[asyncio.AbstractEventLoop] = None
+
+
+class TokenBucket:
+    """Token bucket pacing outbound requests to a single host"""
+
+    def __init__(self, capacity: float, refill_rate: float) -> None:
+        self.capacity = capacity
+        self.refill_rate = refill_rate
+        self.tokens = capacity
+        self.updated_at = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    def _refill(self) -> None:
+        """Add the tokens earned since the last update"""
+        now = time.monotonic()
+        elapsed = now - self.updated_at
+        self.tokens = min(self.capacity, self.tokens + elapsed * self.refill_rate)
+        self.updated_at = now
+
+    async def acquire(self) -> None:
+        """Wait until a token is available and take it"""
+        async with self._lock:
+            self._refill()
+            while self.tokens < 1:
+                await asyncio.sleep((1 - self.tokens) / self.refill_rate)
+                self._refill()
+            self.tokens -= 1
+
+    def penalize(self) -> None:
+        """Drain the bucket after a 429 so the following requests back off too"""
+        self._refill()
+        self.tokens = min(self.tokens - self.refill_rate, -1)
+
+
+def _retry_delay(response: httpx.Response, attempt: int) -> float:
+    """Get how long to wait before retrying a 429 response"""
+    retry_after = response.headers.get("retry-after")
+    if retry_after:
+        try:
+            return max(0.0, float(retry_after))
+        except ValueError:
+            try:
+                retry_at = parsedate_to_datetime(retry_after)
+                return max(0.0, retry_at.timestamp() - time.time())
+            except (TypeError, ValueError):
+                pass
+    # Exponential backoff with full jitter, never longer than the retry cap
+    backoff = min(RATE_LIMIT_BACKOFF * 2 ** attempt, RATE_LIMIT_MAX_DELAY)
+    return random.uniform(0, backoff)
+
+
+class RateLimitedTransport(httpx.AsyncBaseTransport):
+    """Transport that rate limits requests per host and retries 429 responses"""
+
+    def __init__(self, transport: httpx.AsyncBaseTransport) -> None:
+        self._transport = transport
+        self._buckets: Dict[str, TokenBucket] = {}
+
+    def _bucket(self, host: str) -> TokenBucket:
+        """Get the token bucket for a host"""
+        bucket = self._buckets.get(host)
+        if bucket is None:
+            bucket = TokenBucket(RATE_LIMIT_CAPACITY, RATE_LIMIT_REFILL_RATE)
+            self._buckets[host] = bucket
+        return bucket
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        bucket = self._bucket(request.url.host)
+        attempt = 0
+        while True:
+            await bucket.acquire()
+            response = await self._transport.handle_async_request(request)
+            if response.status_code != 429 or attempt >= RATE_LIMIT_MAX_RETRIES:
+                return response
+            
+            bucket.penalize()
+            delay = _retry_delay(response, attempt)
+            # Waiting longer than the cap would stall the tool call, so let the
+            # caller see the 429 instead
+            if delay > RATE_LIMIT_MAX_DELAY:
+                logger.warning(
+                    f"Rate limited by {request.url.host} for {delay:.1f}s, not retrying"
+                )
+                return response
+            
+            await response.aclose()
+            logger.warning(
+                f"Rate limited by {request.url.host}, retrying in {delay:.1f}s"
+            )
+            await asyncio.sleep(delay)
+            attempt += 1
+
+    async def aclose(self) -> None:
+        await self._transport.aclose()
+
+
+def get_http_client() -> httpx.AsyncClient:
+    """Get the shared HTTP client used for Elastic Path API requests"""
+    global _http_client, _http_client_loop
+    # Created lazily so it binds to the event loop that actually serves requests,
+    # and recreated when called from another loop, e.g. a second in-process run
+    loop = asyncio.get_running_loop()
+    if _http_client is None or _http_client.is_closed or _http_client_loop is not loop:
+        _http_client_loop = loop
+        _http_client = httpx.AsyncClient(
+            timeout=HTTP_TIMEOUT,
+            transport=RateLimitedTransport(
+                httpx.AsyncHTTPTransport(limits=HTTP_LIMITS, http2=True, retries=2)
+            ),
+        )
+    return _http_client
+
+
+async def close_http_client() -> None:
+    """Close the shared HTTP client and release its pooled connections"""
+    global _http_client, _http_client_loop
+    # A client left behind by a finished loop cannot be closed from this one
+    if _http_client is not None and _http_client_loop is asyncio.get_running_loop():
+        await _http_client.aclose()
+    _http_client = None
+    _http_client_loop = None
+
+
+# Client credentials token cache, shared by all tool calls. expires_at is a
+# time.monotonic() deadline, so wall-clock jumps do not affect it.
+_token_cache = {
+    "access_token": None,
+    "expires_at": 0.0
+}
+# The token request currently in flight, shared by every caller that needs a
+# new token so concurrent refreshes collapse into a single OAuth request
+_token_fetch: Optional[asyncio.Task] = None
+
+# Tokens are refreshed in the background once this fraction of their lifetime
+# has passed, before the 10% safety margin makes the cached one expire
+TOKEN_REFRESH_AT = 0.8
+_token_refresh_handle: Optional[asyncio.TimerHandle] = None
+
+# Auth headers for the most recently used token
+_headers_cache: Dict[str, Any] = {
+    "token": None,
+    "json": None,
+    "multipart": None
+}
 
 
 # Helper functions for authentication
-async def get_access_token() -> str:
-    """Get an access token for the Elastic Path API"""
-    if DISABLE_AUTH:
-        return "development-token"
-    
+def _cached_access_token() -> Optional[str]:
+    """Get the cached access token if it has not expired yet"""
+    if _token_cache["access_token"] and time.monotonic() < _token_cache["expires_at"]:
+        return _token_cache["access_token"]
+    return None
+
+
+async def _fetch_access_token() -> str:
+    """Request a new access token and store it in the cache"""
     token_endpoint = f"{BASE_URL}/oauth/access_token"
     payload = {
         "client_id": CLIENT_ID,
@@ -47,21 +244,134 @@ async def get_access_token() -> str:
         "Content-Type": "application/x-www-form-urlencoded"
     }
     
-    async with httpx.AsyncClient() as client:
-        response = await client.post(token_endpoint, data=payload, headers=headers)
-        response.raise_for_status()
-        token_data = response.json()
-        return token_data.get("access_token")
+    now = time.monotonic()
+    client = get_http_client()
+    response = await client.post(token_endpoint, data=payload, headers=headers)
+    response.raise_for_status()
+    token_data = response.json()
+    access_token = token_data.get("access_token")
+    expires_in = token_data.get("expires_in", 3600)  # Default 1 hour
+    
+    # Update cache with 10% safety margin
+    _token_cache["access_token"] = access_token
+    _token_cache["expires_at"] = now + expires_in * 0.9
+    _schedule_token_refresh(expires_in * TOKEN_REFRESH_AT)
+    return access_token
 
 
-async def get_auth_headers(user_token: Optional[str] = None) -> Dict[str, str]:
-    """Get the authentication headers for API requests"""
-    token = user_token or await get_access_token()
-    return {
-        "Authorization": f"Bearer {token}",
+def _schedule_token_refresh(delay: float) -> None:
+    """Schedule a background token refresh, replacing any pending one"""
+    global _token_refresh_handle
+    if _token_refresh_handle is not None:
+        _token_refresh_handle.cancel()
+    _token_refresh_handle = asyncio.get_running_loop().call_later(
+        delay, _start_background_refresh
+    )
+
+
+def _refresh_access_token() -> asyncio.Task:
+    """Start a token request, or join the one already in flight"""
+    global _token_fetch
+    if _token_fetch is None or _token_fetch.done():
+        _token_fetch = asyncio.create_task(_fetch_access_token())
+    return _token_fetch
+
+
+def _start_background_refresh() -> None:
+    """Refresh the access token before it expires so callers never wait on OAuth"""
+    _refresh_access_token().add_done_callback(_log_refresh_failure)
+
+
+def _log_refresh_failure(task: asyncio.Task) -> None:
+    """Log a failed background refresh and keep serving the current token"""
+    if not task.cancelled() and task.exception() is not None:
+        # Once the current token expires get_access_token requests a new one
+        logger.warning(f"Background token refresh failed: {task.exception()}")
+
+
+def cancel_token_refresh() -> None:
+    """Cancel any scheduled background refresh and in-flight token request"""
+    global _token_refresh_handle, _token_fetch
+    if _token_refresh_handle is not None:
+        _token_refresh_handle.cancel()
+        _token_refresh_handle = None
+    if _token_fetch is not None:
+        _token_fetch.cancel()
+        _token_fetch = None
+
+
+async def get_access_token() -> str:
+    """Get an access token for the Elastic Path API"""
+    if DISABLE_AUTH:
+        return "development-token"
+    
+    token = _cached_access_token()
+    if token:
+        return token
+    
+    # Shielded so a cancelled tool call does not cancel the request that
+    # other callers are waiting on
+    return await asyncio.shield(_refresh_access_token())
+
+
+def _build_auth_headers(token: str) -> None:
+    """Rebuild the cached JSON and multipart headers for a token"""
+    authorization = f"Bearer {token}"
+    _headers_cache["token"] = token
+    _headers_cache["json"] = MappingProxyType({
+        "Authorization": authorization,
         "Content-Type": "application/json",
         "Accept": "application/json",
-    }
+    })
+    # Content-Type is left to the multipart encoder, which adds the boundary
+    _headers_cache["multipart"] = MappingProxyType({
+        "Authorization": authorization,
+        "Accept": "application/json",
+    })
+
+
+def get_bearer_token(authorization: Optional[str] = None) -> Optional[str]:
+    """
+    Get the caller's token from the authorization argument
+    
+    Strips a leading "Bearer " scheme so the token is not sent upstream as
+    "Bearer Bearer ..." by get_auth_headers; a bare token is returned as is.
+    """
+    if authorization and authorization[:7].lower() == "bearer ":
+        return authorization[7:].strip()
+    return authorization
+
+
+async def report_progress(ctx: Context, progress: float, message: str) -> None:
+    """
+    Report a tool's progress to the client and log the step
+    
+    Progress notifications carry no message in this MCP version, so the
+    message is only logged. Outside an MCP request, e.g. when a tool is called
+    in-process, there is no client to notify and only the log is written.
+    """
+    logger.info(message)
+    try:
+        await ctx.report_progress(progress, 1.0)
+    except ValueError:  # Context is not available outside of a request
+        pass
+
+
+async def get_auth_headers(
+    user_token: Optional[str] = None,
+    multipart: bool = False,
+) -> Mapping[str, str]:
+    """
+    Get the authentication headers for API requests
+    
+    The headers are cached for the most recently used token and returned as
+    a read-only mapping, so they are shared between calls rather than
+    rebuilt each time.
+    """
+    token = user_token or await get_access_token()
+    if token != _headers_cache["token"]:
+        _build_auth_headers(token)
+    return _headers_cache["multipart" if multipart else "json"]
 
 
 # Direct API helpers (not exposed as resources)
@@ -75,31 +385,21 @@ async def list_files_api(
     filter_file_size: Optional[int] = None,
 ) -> Dict[str, Any]:
     """API function to list files"""
-    # Build query parameters
-    params = {}
-    
-    # Pagination
-    params["page[limit]"] = page_limit
-    params["page[offset]"] = page_offset
-    
-    # Filters
-    if filter_name:
-        params["filter[name]"] = filter_name
-    if filter_width:
-        params["filter[width]"] = filter_width
-    if filter_height:
-        params["filter[height]"] = filter_height
-    if filter_file_size:
-        params["filter[file_size]"] = filter_file_size
+    # Build query parameters: pagination plus whichever filters are set
+    params = {"page[limit]": page_limit, "page[offset]": page_offset}
+    filters = (filter_name, filter_width, filter_height, filter_file_size)
+    params.update(
+        (key, value) for key, value in zip(FILTER_PARAMS, filters) if value
+    )
     
     # Make request to Elastic Path API
-    url = f"{BASE_URL}/{API_VERSION}/files"
+    url = FILES_URL
     headers = await get_auth_headers(authorization)
     
-    async with httpx.AsyncClient() as client:
-        response = await client.get(url, headers=headers, params=params)
-        response.raise_for_status()
-        return response.json()
+    client = get_http_client()
+    response = await client.get(url, headers=headers, params=params)
+    response.raise_for_status()
+    return response.json()
 
 
 async def get_file_api(
@@ -108,13 +408,13 @@ async def get_file_api(
 ) -> Dict[str, Any]:
     """API function to get a single file"""
     # Make request to Elastic Path API
-    url = f"{BASE_URL}/{API_VERSION}/files/{file_id}"
+    url = f"{FILES_URL}/{file_id}"
     headers = await get_auth_headers(authorization)
     
-    async with httpx.AsyncClient() as client:
-        response = await client.get(url, headers=headers)
-        response.raise_for_status()
-        return response.json()
+    client = get_http_client()
+    response = await client.get(url, headers=headers)
+    response.raise_for_status()
+    return response.json()
 
 
 # Tools - Operations with side effects
@@ -145,10 +445,10 @@ async def list_files(
     Returns:
         Dictionary with file listing data
     """
-    ctx.progress(0.2, "Authenticating with Elastic Path API")
+    await report_progress(ctx, 0.2, "Authenticating with Elastic Path API")
     
-    # Get the token from the authorization header if it exists
-    auth = authorization or ctx.request.headers.get("authorization")
+    # Get the token from the authorization argument if it was given
+    auth = get_bearer_token(authorization)
     
     result = await list_files_api(
         authorization=auth,
@@ -160,7 +460,7 @@ async def list_files(
         filter_file_size=filter_file_size
     )
     
-    ctx.progress(0.9, f"Retrieved {len(result.get('data', []))} files")
+    await report_progress(ctx, 0.9, f"Retrieved {len(result.get('data', []))} files")
     return result
 
 
@@ -181,17 +481,17 @@ async def get_file(
     Returns:
         Dictionary with file data
     """
-    ctx.progress(0.2, "Authenticating with Elastic Path API")
+    await report_progress(ctx, 0.2, "Authenticating with Elastic Path API")
     
-    # Get the token from the authorization header if it exists
-    auth = authorization or ctx.request.headers.get("authorization")
+    # Get the token from the authorization argument if it was given
+    auth = get_bearer_token(authorization)
     
     result = await get_file_api(
         file_id=file_id,
         authorization=auth
     )
     
-    ctx.progress(0.9, f"Retrieved file {file_id}")
+    await report_progress(ctx, 0.9, f"Retrieved file {file_id}")
     return result
 
 
@@ -218,32 +518,29 @@ async def upload_file(
     Returns:
         Dictionary with uploaded file data
     """
-    ctx.progress(0.2, "Authenticating with Elastic Path API")
+    await report_progress(ctx, 0.2, "Authenticating with Elastic Path API")
     
-    # Get the token from the authorization header if it exists
-    auth = authorization or ctx.request.headers.get("authorization")
+    # Get the token from the authorization argument if it was given
+    auth = get_bearer_token(authorization)
     
     # Make request to Elastic Path API
-    url = f"{BASE_URL}/{API_VERSION}/files"
-    headers = await get_auth_headers(auth)
-    # Remove content-type from headers as it will be set by the multipart encoder
-    if "Content-Type" in headers:
-        del headers["Content-Type"]
+    url = FILES_URL
+    headers = await get_auth_headers(auth, multipart=True)
     
-    ctx.progress(0.4, "Preparing file upload")
+    await report_progress(ctx, 0.4, "Preparing file upload")
     
     # Create the form data
     files = {"file": (file_name, file_content, content_type)}
     data = {"public_status": str(public_status).lower()}
     
-    ctx.progress(0.6, f"Uploading file '{file_name}'")
+    await report_progress(ctx, 0.6, f"Uploading file '{file_name}'")
     
-    async with httpx.AsyncClient() as client:
-        response = await client.post(url, headers=headers, files=files, data=data)
-        response.raise_for_status()
-        result = response.json()
+    client = get_http_client()
+    response = await client.post(url, headers=headers, files=files, data=data)
+    response.raise_for_status()
+    result = response.json()
     
-    ctx.progress(0.9, f"File uploaded successfully with ID: {result.get('data', {}).get('id')}")
+    await report_progress(ctx, 0.9, f"File uploaded successfully with ID: {result.get('data', {}).get('id')}")
     return result
 
 
@@ -264,28 +561,28 @@ async def delete_file(
     Returns:
         Dictionary with deleted file confirmation
     """
-    ctx.progress(0.2, "Authenticating with Elastic Path API")
+    await report_progress(ctx, 0.2, "Authenticating with Elastic Path API")
     
-    # Get the token from the authorization header if it exists
-    auth = authorization or ctx.request.headers.get("authorization")
+    # Get the token from the authorization argument if it was given
+    auth = get_bearer_token(authorization)
     
     # Make request to Elastic Path API
-    url = f"{BASE_URL}/{API_VERSION}/files/{file_id}"
+    url = f"{FILES_URL}/{file_id}"
     headers = await get_auth_headers(auth)
     
-    ctx.progress(0.5, f"Deleting file with ID: {file_id}")
+    await report_progress(ctx, 0.5, f"Deleting file with ID: {file_id}")
     
-    async with httpx.AsyncClient() as client:
-        response = await client.delete(url, headers=headers)
-        response.raise_for_status()
-        
-        # Return empty object for 204 responses
-        if response.status_code == 204:
-            result = {"status": "success", "message": f"File with ID {file_id} deleted successfully"}
-        else:
-            result = response.json()
+    client = get_http_client()
+    response = await client.delete(url, headers=headers)
+    response.raise_for_status()
     
-    ctx.progress(0.9, f"File deleted successfully")
+    # Return empty object for 204 responses
+    if response.status_code == 204:
+        result = {"status": "success", "message": f"File with ID {file_id} deleted successfully"}
+    else:
+        result = response.json()
+    
+    await report_progress(ctx, 0.9, f"File deleted successfully")
     return result
 
 
@@ -294,7 +591,7 @@ async def download_file(
     ctx: Context,
     file_id: str,
     authorization: Optional[str] = None
-) -> bytes:
+) -> EmbeddedResource:
     """
     Download a file from Elastic Path
     
@@ -304,38 +601,92 @@ async def download_file(
         authorization: Optional authorization token (Bearer token)
     
     Returns:
-        Raw file content as bytes
+        Embedded blob resource with the base64 encoded file content and
+        its MIME type
     """
-    ctx.progress(0.2, "Authenticating with Elastic Path API")
+    await report_progress(ctx, 0.2, "Authenticating with Elastic Path API")
     
-    # Get the token from the authorization header if it exists
-    auth = authorization or ctx.request.headers.get("authorization")
+    # Get the token from the authorization argument if it was given
+    auth = get_bearer_token(authorization)
+    
+    # Resolve the token once and reuse it for the details and content requests
+    token = auth or await get_access_token()
     
     # First get the file details to get the download URL
-    file_data = await get_file_api(file_id=file_id, authorization=auth)
+    file_data = await get_file_api(file_id=file_id, authorization=token)
     
-    ctx.progress(0.4, f"Getting file details for ID: {file_id}")
+    await report_progress(ctx, 0.4, f"Getting file details for ID: {file_id}")
     
     # Get the download URL from the response
     if "data" in file_data and "links" in file_data["data"] and "download" in file_data["data"]["links"]:
         download_url = file_data["data"]["links"]["download"]
         file_name = file_data["data"]["name"]
+        mime_type = file_data["data"].get("mime_type", "application/octet-stream")
         
-        ctx.progress(0.6, f"Downloading file: {file_name}")
+        await report_progress(ctx, 0.6, f"Downloading file: {file_name}")
         
-        # Download the file content
-        async with httpx.AsyncClient() as client:
-            headers = {"Authorization": f"Bearer {auth}" if auth else await get_auth_headers()}
-            response = await client.get(download_url, headers=headers)
+        # Stream the file content so oversized files are rejected before
+        # they are buffered, instead of after
+        client = get_http_client()
+        headers = {"Authorization": f"Bearer {token}"}
+        async with client.stream("GET", download_url, headers=headers) as response:
             response.raise_for_status()
-            content = response.content
+            content_length = int(response.headers.get("content-length", 0))
+            if content_length > MAX_DOWNLOAD_SIZE:
+                raise ValueError(
+                    f"File is too large to download: {content_length} bytes "
+                    f"(limit is {MAX_DOWNLOAD_SIZE} bytes)"
+                )
+            
+            chunks = []
+            received = 0
+            async for chunk in response.aiter_bytes(DOWNLOAD_CHUNK_SIZE):
+                received += len(chunk)
+                if received > MAX_DOWNLOAD_SIZE:
+                    raise ValueError(
+                        f"File is too large to download: more than "
+                        f"{MAX_DOWNLOAD_SIZE} bytes"
+                    )
+                chunks.append(chunk)
+        content = b"".join(chunks)
+        
+        await report_progress(ctx, 0.9, f"File download complete: {len(content)} bytes")
         
-        ctx.progress(0.9, f"File download complete: {len(content)} bytes")
-        return content
+        # Binary tool results have to be base64 in JSON-RPC; wrapping them in
+        # a blob resource encodes them exactly once and keeps the MIME type
+        return EmbeddedResource(
+            type="resource",
+            resource=BlobResourceContents(
+                uri=f"elastic-path://files/{file_id}",
+                mimeType=mime_type,
+                blob=base64.b64encode(content).decode("ascii"),
+            ),
+        )
     else:
         raise ValueError("Download link not found in file data")
 
 
+async def shutdown() -> None:
+    """Stop token refreshes and close the shared HTTP client"""
+    cancel_token_refresh()
+    await close_http_client()
+
+
+async def main() -> None:
+    """Run the server over stdio, closing the shared HTTP client on exit"""
+    loop = asyncio.get_running_loop()
+    logger.info(f"Starting {mcp.name} on {type(loop).__module__}.{type(loop).__name__}")
+    try:
+        await mcp.run_stdio_async()
+    finally:
+        await shutdown()
+
+
 # Run the server
 if __name__ == "__main__":
-    asyncio.run(mcp.run())
\ No newline at end of file
+    try:
+        import uvloop
+    except ImportError:  # uvloop is not available on Windows
+        asyncio.run(main())
+    else:
+        uvloop.run(main())
\ No newline at end of file
@@ -6,24 +6,87 @@ tools and resources for authentication with the Elastic Path API.
 """
 
 import asyncio
+import hashlib
 import httpx
+import logging
 import os
 import json
+import time
 
-from datetime import datetime, timedelta
-from dotenv import load_dotenv
+from collections import OrderedDict
 from typing import Any, Dict, Optional
 
 from mcp.server.fastmcp import FastMCP
 from mcp.server.fastmcp.server import Context
 
+logger = logging.getLogger(__name__)
+
+# Load environment variables; deployments that set them directly can skip
+# the .env lookup with SKIP_DOTENV=1
+if os.getenv("SKIP_DOTENV") != "1":
+    from dotenv import load_dotenv
+    load_dotenv()
+
+BASE_URL = os.getenv("BASE_URL", "https://euwest.api.elasticpath.com")
+API_VERSION = os.getenv("API_VERSION", "v2")
+
+# Shared HTTP client so token requests and validations reuse pooled
+# keep-alive connections instead of opening a new one per call
+HTTP_TIMEOUT = httpx.Timeout(10.0, connect=5.0)
+HTTP_LIMITS = httpx.Limits(
+    max_connections=1000,
+    max_keepalive_connections=100,
+    keepalive_expiry=15.0,
+)
+
+_http_client: Optional[httpx.AsyncClient] = None
+# Loop the shared client was created on; its pooled connections belong to it
+_http_client_loop: Optional[asyncio.AbstractEventLoop] = None
+
+# expires_at is a time.monotonic() deadline, so wall-clock jumps cannot
+# expire a valid token early or keep a stale one alive
 token_cache = {
     "access_token": None,
-    "expires_at": None
+    "expires_at": 0.0
 }
 
+# Successful token validations, keyed by a digest of (base_url, token) so raw
+# tokens are not kept around. Values are time.monotonic() expiry deadlines.
+VALIDATION_CACHE_TTL = 120  # seconds
+VALIDATION_CACHE_MAX_SIZE = 10_000
+validation_cache: "OrderedDict[bytes, float]" = OrderedDict()
+# Validations currently in flight, joined by concurrent callers of the same token
+_validations_in_flight: Dict[bytes, asyncio.Task] = {}
+
 mcp = FastMCP("elastic-path-auth-api")
 
+
+def get_http_client() -> httpx.AsyncClient:
+    """Get the shared HTTP client used for Elastic Path API requests"""
+    global _http_client, _http_client_loop
+    # Created lazily so it binds to the event loop that actually serves requests,
+    # and recreated when called from another loop, e.g. a second in-process run
+    loop = asyncio.get_running_loop()
+    if _http_client is None or _http_client.is_closed or _http_client_loop is not loop:
+        _http_client_loop = loop
+        _http_client = httpx.AsyncClient(
+            timeout=HTTP_TIMEOUT,
+            limits=HTTP_LIMITS,
+            http2=True,
+        )
+    return _http_client
+
+
+async def close_http_client() -> None:
+    """Close the shared HTTP client and release its pooled connections"""
+    global _http_client, _http_client_loop
+    # A client left behind by a finished loop cannot be closed from this one
+    if _http_client is not None and _http_client_loop is asyncio.get_running_loop():
+        await _http_client.aclose()
+    _http_client = None
+    _http_client_loop = None
+
+
 # Resources - Read-only operations
 @mcp.resource("elastic-path://auth/info")
 async def auth_info_resource() -> Dict[str, Any]:
@@ -63,17 +126,16 @@ async def get_client_credentials_token(
         raise ValueError("Client ID and Client Secret are required.")
     
     # Check if we have a valid cached token
-    now = datetime.now()
+    now = time.monotonic()
     if (
         not force_refresh 
         and token_cache["access_token"] 
-        and token_cache["expires_at"] 
         and now < token_cache["expires_at"]
     ):
         return {
             "access_token": token_cache["access_token"],
             "token_type": "bearer",
-            "expires_in": int((token_cache["expires_at"] - now).total_seconds()),
+            "expires_in": int(token_cache["expires_at"] - now),
             "cached": True
         }
     
@@ -90,22 +152,22 @@ async def get_client_credentials_token(
     }
     
     try:
-        async with httpx.AsyncClient() as client:
-            response = await client.post(token_endpoint, data=payload, headers=headers)
-            response.raise_for_status()
-            
-            token_data = response.json()
-            access_token = token_data.get("access_token")
-            expires_in = token_data.get("expires_in", 3600)  # Default 1 hour
-            
-            # Update cache with 10% safety margin
-            token_cache["access_token"] = access_token
-            token_cache["expires_at"] = now + timedelta(seconds=int(expires_in * 0.9))
-            
-            return {
-                **token_data,
-                "cached": False
-            }
+        client = get_http_client()
+        response = await client.post(token_endpoint, data=payload, headers=headers)
+        response.raise_for_status()
+        
+        token_data = response.json()
+        access_token = token_data.get("access_token")
+        expires_in = token_data.get("expires_in", 3600)  # Default 1 hour
+        
+        # Update cache with 10% safety margin
+        token_cache["access_token"] = access_token
+        token_cache["expires_at"] = now + expires_in * 0.9
+        
+        return {
+            **token_data,
+            "cached": False
+        }
     except httpx.HTTPStatusError as e:
         error_data = {"error": "authentication_failed"}
         try:
@@ -116,53 +178,126 @@ async def get_client_credentials_token(
         raise ValueError(f"Authentication failed: {error_data.get('error_description', str(e))}")
 
 
-# @mcp.tool()
-# async def validate_token(
-#     ctx: Context,
-#     token: str
-# ) -> Dict[str, Any]:
-#     """
-#     Validate if a token is valid by making a test request
+def _validation_key(base_url: str, token: str) -> bytes:
+    """Build the validation cache key for a token"""
+    return hashlib.blake2b(f"{base_url}\0{token}".encode(), digest_size=16).digest()
+
+
+def _is_validated(key: bytes) -> bool:
+    """Check whether a token validation is cached and still fresh"""
+    expires_at = validation_cache.get(key)
+    if expires_at is None:
+        return False
+    if time.monotonic() >= expires_at:
+        del validation_cache[key]
+        return False
+    validation_cache.move_to_end(key)
+    return True
+
+
+def _remember_validation(key: bytes) -> None:
+    """Cache a successful token validation, evicting the oldest entries"""
+    validation_cache[key] = time.monotonic() + VALIDATION_CACHE_TTL
+    validation_cache.move_to_end(key)
+    while len(validation_cache) > VALIDATION_CACHE_MAX_SIZE:
+        validation_cache.popitem(last=False)
+
+
+def _cached_validation_result() -> Dict[str, Any]:
+    """Build the validation result returned on a cache hit"""
+    return {
+        "valid": True,
+        "status_code": 200,
+        "message": "Token is valid",
+        "cached": True
+    }
+
+
+async def _check_token(base_url: str, token: str, key: bytes) -> Dict[str, Any]:
+    """Validate a token against the API, caching a successful result"""
+    # Make a simple request to validate the token
+    url = f"{base_url}/{API_VERSION}/files"
+    params = {"page[limit]": 1}
+    headers = {
+        "Authorization": f"Bearer {token}",
+        "Accept": "application/json"
+    }
+    
+    try:
+        client = get_http_client()
+        response = await client.get(url, headers=headers, params=params)
+        response.raise_for_status()
+    except httpx.HTTPStatusError as e:
+        return {
+            "valid": False,
+            "status_code": e.response.status_code,
+            "message": f"Token validation failed: {e.response.status_code} {e.response.reason_phrase}",
+            "cached": False
+        }
+    
+    _remember_validation(key)
+    return {
+        "valid": True,
+        "status_code": response.status_code,
+        "message": "Token is valid",
+        "cached": False
+    }
+
+
+@mcp.tool()
+async def validate_token(
+    token: str,
+    base_url: str = BASE_URL
+) -> Dict[str, Any]:
+    """
+    Validate if a token is valid by making a test request
     
-#     Args:
-#         ctx: MCP context
-#         token: The token to validate
+    Successful validations are cached for VALIDATION_CACHE_TTL seconds and
+    concurrent validations of the same token share a single request and its
+    result. Failed validations are never cached.
     
-#     Returns:
-#         Dictionary with validation result
-#     """
-#     ctx.progress(0.3, "Testing token validity")
+    Args:
+        token: The token to validate
+        base_url: Elastic Path API base URL
     
-#     # Make a simple request to validate the token
-#     url = f"{BASE_URL}/{os.getenv('API_VERSION', 'v2')}/files?page[limit]=1"
-#     headers = {
-#         "Authorization": f"Bearer {token}",
-#         "Accept": "application/json"
-#     }
+    Returns:
+        Dictionary with validation result
+    """
+    key = _validation_key(base_url, token)
+    if _is_validated(key):
+        return _cached_validation_result()
     
-#     try:
-#         async with httpx.AsyncClient() as client:
-#             response = await client.get(url, headers=headers)
-#             response.raise_for_status()
-            
-#             ctx.progress(0.9, "Token is valid")
-#             return {
-#                 "valid": True,
-#                 "status_code": response.status_code,
-#                 "message": "Token is valid"
-#             }
-#     except httpx.HTTPStatusError as e:
-#         ctx.progress(0.9, "Token validation failed")
-#         return {
-#             "valid": False,
-#             "status_code": e.response.status_code,
-#             "message": f"Token validation failed: {e.response.status_code} {e.response.reason_phrase}"
-#         }
+    task = _validations_in_flight.get(key)
+    if task is None:
+        task = asyncio.create_task(_check_token(base_url, token, key))
+        _validations_in_flight[key] = task
+        task.add_done_callback(lambda _: _validations_in_flight.pop(key, None))
+    
+    # Shielded so a cancelled caller does not cancel the shared request
+    return {**await asyncio.shield(task)}
+
+
+async def shutdown() -> None:
+    """Close the shared HTTP client"""
+    await close_http_client()
+
+
+async def main() -> None:
+    """Run the server over stdio, closing the shared HTTP client on exit"""
+    loop = asyncio.get_running_loop()
+    logger.info(f"Starting {mcp.name} on {type(loop).__module__}.{type(loop).__name__}")
+    try:
+        await mcp.run_stdio_async()
+    finally:
+        await shutdown()
 
 
 # Run the server
 if __name__ == "__main__":
-    # asyncio.run(mcp.run())
-    print(f'starting mcp server... {mcp.name}')
-    mcp.run(transport='stdio')
+    try:
+        import uvloop
+    except ImportError:  # uvloop is not available on Windows
+        asyncio.run(main())
+    else:
+        uvloop.run(main())
     
\ No newline at end of file
@@ -0,0 +1,142 @@
+"""
+Tests for the rate limited transport used by the Files API server
+"""
+
+import asyncio
+import time
+from datetime import datetime, timedelta, timezone
+from email.utils import format_datetime
+
+import httpx
+import pytest
+
+from src import mcp_server
+
+
+class FreeBucket:
+    """Token bucket that never makes a request wait"""
+
+    def __init__(self) -> None:
+        self.penalties = 0
+
+    async def acquire(self) -> None:
+        pass
+
+    def penalize(self) -> None:
+        self.penalties += 1
+
+
+@pytest.fixture
+def bucket(monkeypatch):
+    """Take the token bucket out of the way so only retries are exercised"""
+    bucket = FreeBucket()
+    monkeypatch.setattr(
+        mcp_server.RateLimitedTransport, "_bucket", lambda self, host: bucket
+    )
+    return bucket
+
+
+@pytest.fixture
+def sleeps(monkeypatch, bucket):
+    """Record retry delays instead of sleeping through them"""
+    delays = []
+
+    async def fake_sleep(delay):
+        delays.append(delay)
+
+    monkeypatch.setattr(mcp_server.asyncio, "sleep", fake_sleep)
+    return delays
+
+
+def make_client(handler):
+    """Build a client whose requests go through RateLimitedTransport"""
+    transport = mcp_server.RateLimitedTransport(httpx.MockTransport(handler))
+    return httpx.AsyncClient(transport=transport, base_url="https://api.test")
+
+
+def send(handler, **request):
+    """Send one request through the rate limited transport"""
+    async def run():
+        async with make_client(handler) as client:
+            return await client.request(**request)
+
+    return asyncio.run(run())
+
+
+def rate_limited(times, retry_after):
+    """Build a handler answering 429 the first `times` requests"""
+    requests = []
+
+    def handler(request):
+        requests.append(request)
+        if len(requests) <= times:
+            return httpx.Response(429, headers={"Retry-After": retry_after})
+        return httpx.Response(200, json={"data": []})
+
+    return handler, requests
+
+
+def test_retries_after_numeric_retry_after(sleeps, bucket):
+    handler, requests = rate_limited(1, "2")
+
+    response = send(handler, method="GET", url="/v2/files")
+
+    assert response.status_code == 200
+    assert len(requests) == 2
+    assert sleeps == [2.0]
+    assert bucket.penalties == 1
+
+
+def test_retries_after_http_date_retry_after(sleeps):
+    retry_at = datetime.now(timezone.utc) + timedelta(seconds=3)
+    handler, requests = rate_limited(1, format_datetime(retry_at, usegmt=True))
+
+    response = send(handler, method="GET", url="/v2/files")
+
+    assert response.status_code == 200
+    assert len(requests) == 2
+    # HTTP dates have a resolution of one second
+    assert len(sleeps) == 1
+    assert 1.0 <= sleeps[0] <= 3.0
+
+
+def test_gives_up_after_max_retries(sleeps):
+    handler, requests = rate_limited(100, "0")
+
+    response = send(handler, method="GET", url="/v2/files")
+
+    assert response.status_code == 429
+    assert len(requests) == mcp_server.RATE_LIMIT_MAX_RETRIES + 1
+    assert sleeps == [0.0] * mcp_server.RATE_LIMIT_MAX_RETRIES
+
+
+def test_returns_429_when_retry_after_exceeds_max_delay(sleeps):
+    retry_after = mcp_server.RATE_LIMIT_MAX_DELAY + 60
+    handler, requests = rate_limited(1, str(retry_after))
+
+    started = time.monotonic()
+    response = send(handler, method="GET", url="/v2/files")
+
+    assert response.status_code == 429
+    assert len(requests) == 1
+    assert sleeps == []
+    assert time.monotonic() - started < 1.0
+
+
+def test_resends_multipart_body_on_retry(sleeps):
+    handler, requests = rate_limited(1, "0")
+
+    response = send(
+        handler,
+        method="POST",
+        url="/v2/files",
+        files={"file": ("hello.txt", b"hello world", "text/plain")},
+        data={"public_status": "true"},
+    )
+
+    assert response.status_code == 200
+    assert len(requests) == 2
+    first, retry = (request.content for request in requests)
+    assert b"hello world" in first
+    assert retry == first
+    assert requests[0].headers["content-type"] == requests[1].headers["content-type"]
@@ -10,106 +10,467 @@ import os
 import sys
 import json
 import asyncio
+import concurrent.futures
+import tempfile
+import time
 from datetime import datetime
 from pathlib import Path
+from typing import Awaitable, Callable, Optional
 
-# Add parent directory to path
-sys.path.append(str(Path(__file__).parent.parent))
+# Add the project root to the path once, so the servers import as src.*
+PROJECT_ROOT = str(Path(__file__).resolve().parents[1])
+if PROJECT_ROOT not in sys.path:
+    sys.path.insert(0, PROJECT_ROOT)
 
-from dotenv import load_dotenv
-from mcp import ClientSession, StdioServerParameters  
-from mcp.client.stdio import stdio_client
+# The imports below follow the guarded path setup, which ruff only exempts
+# from E402 when it is a bare sys.path call
+from mcp import ClientSession, StdioServerParameters  # noqa: E402
+from mcp.client.stdio import stdio_client  # noqa: E402
+from mcp.server.fastmcp import FastMCP  # noqa: E402
+from mcp.server.fastmcp.exceptions import ToolError  # noqa: E402
+from mcp.types import CallToolResult, TextContent  # noqa: E402
 
-# Load environment variables
-load_dotenv()
+# Load environment variables; SKIP_DOTENV=1 skips the .env lookup and the
+# dotenv import along with it
+if os.getenv("SKIP_DOTENV") != "1":
+    from dotenv import load_dotenv
+    load_dotenv()
 
-async def run_mcp_client_test():
-    """Run a test of the Elastic Path Files and Auth MCP clients"""
-    print("\n=== Testing Elastic Path MCP Clients ===\n")
-    
-    print("\n--- STEP 1: Obtain Authentication Token ---")
+BASE_URL = os.getenv("BASE_URL", "https://euwest.api.elasticpath.com")
+CLIENT_ID = os.getenv("CLIENT_ID", "")
+CLIENT_SECRET = os.getenv("CLIENT_SECRET", "")
+CONNECT_TIMEOUT = 30  # seconds to wait for a server to start
+
+# Access token cache shared between runs
+TOKEN_CACHE_PATH = Path(
+    os.getenv("EP_TOKEN_CACHE", Path.home() / ".cache" / "ep_mcp_token.json")
+)
+TOKEN_CACHE_MIN_TTL = 60  # seconds a cached token must still be valid for
+PAGE_LIMIT = 10
+AUTH_SERVER_SCRIPT = "src/mcp_server_auth.py"
+FILES_SERVER_SCRIPT = "src/mcp_server.py"
+# "inproc" calls the servers' tools in this process, "stdio" starts them
+TRANSPORT = os.getenv("MCP_TRANSPORT", "inproc")
+LIST_CONCURRENCY = 4  # pages of files requested at once
+
+def tool_result(result) -> dict:
+    """Decode the JSON payload of an MCP tool call result"""
+    if result.isError:
+        message = result.content[0].text if result.content else "unknown error"
+        raise RuntimeError(f"Tool call failed: {message}")
+    return json.loads(result.content[0].text)
+
+
+def list_files_args(authorization: str, offset: int, limit: int = PAGE_LIMIT) -> dict:
+    """Build the list_files arguments for one page of files"""
+    return {"page_limit": limit, "page_offset": offset, "authorization": authorization}
+
+
+def load_cached_token() -> Optional[dict]:
+    """Load the token saved by a previous run if it is still usable"""
+    try:
+        cached = json.loads(TOKEN_CACHE_PATH.read_text())
+    except (OSError, ValueError):
+        return None
     
-    # Connect to authentication server
-    auth_server = StdioServerParameters(
-        id="auth_server",
-        command="python src/mcp_server_auth.py"
-    )
-    auth_client = await stdio_client(auth_server)
-    auth_context = {}  # Empty context dictionary
+    # Ignore a cache file that was not written by save_cached_token
+    if not isinstance(cached, dict):
+        return None
+    token = cached.get("access_token")
+    expires_at = cached.get("expires_at")
+    if not isinstance(token, str) or not token:
+        return None
+    if isinstance(expires_at, bool) or not isinstance(expires_at, (int, float)):
+        return None
     
+    # Only reuse a token issued to the same client for the same API
+    if cached.get("base_url") != BASE_URL or cached.get("client_id") != CLIENT_ID:
+        return None
+    if expires_at - time.time() <= TOKEN_CACHE_MIN_TTL:
+        return None
+    return cached
+
+
+def save_cached_token(token: str, expires_in: float) -> None:
+    """Save a validated token so following runs can skip the auth server"""
+    TOKEN_CACHE_PATH.parent.mkdir(parents=True, exist_ok=True)
+    cached = {
+        "base_url": BASE_URL,
+        "client_id": CLIENT_ID,
+        "access_token": token,
+        "expires_at": time.time() + expires_in,
+    }
+    # The file holds a live credential, so keep it readable by the owner only.
+    # mkstemp creates the file with mode 0600 and os.replace swaps it in, so
+    # an existing cache file with a wider mode is replaced, not reused.
+    fd, tmp_path = tempfile.mkstemp(dir=TOKEN_CACHE_PATH.parent, prefix=".ep_mcp_token")
     try:
-        # Get a token using client credentials
-        response = await auth_client.run_tool(
-            "get_client_credentials_token",
-            {},  # Will use CLIENT_ID and CLIENT_SECRET from environment
-            auth_context
-        )
-        
-        token_data = response.result
-        token = token_data.get("access_token")
-        
-        if not token:
-            print("❌ ERROR: Failed to obtain access token")
-            return
-            
-        print(f"✅ Successfully obtained access token")
-        print(f"Token type: {token_data.get('token_type', 'bearer')}")
-        print(f"Expires in: {token_data.get('expires_in', 'unknown')} seconds")
-        print(f"Cached: {token_data.get('cached', False)}")
-        
-        # Optional: validate the token
-        validation = await auth_client.run_tool(
-            "validate_token",
-            {"token": token},
-            auth_context
-        )
-        
-        if validation.result.get("valid"):
-            print("✅ Token validation successful")
-        else:
-            print(f"❌ Token validation failed: {validation.result.get('message')}")
-            return
-            
-        print("\n--- STEP 2: Use Token with Files API ---")
+        with os.fdopen(fd, "w") as f:
+            json.dump(cached, f)
+        os.replace(tmp_path, TOKEN_CACHE_PATH)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+
+
+def clear_cached_token() -> None:
+    """Remove a cached token that the API no longer accepts"""
+    try:
+        TOKEN_CACHE_PATH.unlink()
+    except FileNotFoundError:
+        pass
+
+
+class InProcessSession:
+    """
+    Session that calls a FastMCP server's tools directly in this process
+    
+    Skips the subprocess and JSON-RPC framing entirely, which makes it the
+    fast default for tests; results have the same shape as a ClientSession.
+    """
+    
+    def __init__(self, server: FastMCP) -> None:
+        self._server = server
+    
+    async def call_tool(self, name: str, arguments: dict) -> CallToolResult:
+        """Call a tool and wrap its content like a remote tool result"""
+        try:
+            content = await self._server.call_tool(name, arguments)
+        except ToolError as e:
+            return CallToolResult(
+                content=[TextContent(type="text", text=str(e))],
+                isError=True
+            )
+        return CallToolResult(content=list(content))
+
+
+class MCPHost:
+    """
+    Keeps one session open to each MCP server until the host is closed
+    
+    Each server runs in its own task, which enters and later exits its
+    stdio transport, so several servers can be started concurrently without
+    anyio cancel scopes crossing tasks.
+    """
+    
+    def __init__(self) -> None:
+        self.sessions: dict[str, ClientSession] = {}
+        self._tasks: list[asyncio.Task] = []
+        self._closing = asyncio.Event()
+        self._shutdowns: list[Callable[[], Awaitable[None]]] = []
+    
+    async def __aenter__(self) -> "MCPHost":
+        return self
+    
+    async def __aexit__(self, *exc_info) -> None:
+        await self.close()
+    
+    async def connect(self, name: str, server: StdioServerParameters) -> None:
+        """Start a server and wait until its session is initialized"""
+        ready = asyncio.get_running_loop().create_future()
+        self._tasks.append(asyncio.create_task(self._serve(name, server, ready)))
+        await ready
+    
+    def attach(
+        self,
+        name: str,
+        server: FastMCP,
+        shutdown: Optional[Callable[[], Awaitable[None]]] = None
+    ) -> None:
+        """
+        Use a server imported into this process, without a transport
         
-        # Connect to files server
-        files_server = StdioServerParameters(
-            id="files_server",
-            command="python src/mcp_server.py"
+        The server's module state (HTTP client, token refresh) then lives on
+        this loop, so its shutdown coroutine is awaited when the host closes.
+        """
+        self.sessions[name] = InProcessSession(server)
+        if shutdown is not None:
+            self._shutdowns.append(shutdown)
+    
+    async def _serve(
+        self,
+        name: str,
+        server: StdioServerParameters,
+        ready: asyncio.Future
+    ) -> None:
+        """Hold a server session open until close() is called"""
+        try:
+            async with stdio_client(server) as (read, write):
+                async with ClientSession(read, write) as session:
+                    # A server that dies on startup never answers initialize
+                    await asyncio.wait_for(session.initialize(), CONNECT_TIMEOUT)
+                    self.sessions[name] = session
+                    ready.set_result(None)
+                    await self._closing.wait()
+        except Exception as e:
+            if ready.done():
+                raise
+            ready.set_exception(e)
+        finally:
+            self.sessions.pop(name, None)
+            if not ready.done():
+                ready.cancel()
+    
+    async def call_tool(self, name: str, tool: str, arguments: dict) -> dict:
+        """Call a tool on a connected server and decode its result"""
+        return tool_result(await self.sessions[name].call_tool(tool, arguments))
+    
+    async def close(self) -> None:
+        """Close every session and wait for the servers to shut down"""
+        self._closing.set()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        await asyncio.gather(
+            *(shutdown() for shutdown in self._shutdowns),
+            return_exceptions=True
         )
-        files_client = await stdio_client(files_server)
-        files_context = {"authorization": f"Bearer {token}"}
-        
-        # List files
-        print("\n--- Listing Files ---")
-        list_args = {
-            "page_limit": 10,
-            "page_offset": 0
-        }
-        
-        response = await files_client.run_tool(
-            "list_files",
-            list_args,
-            files_context
+
+
+async def list_all_files(
+    host: MCPHost,
+    authorization: str,
+    first_page: Optional[dict] = None,
+    page_size: int = PAGE_LIMIT,
+    concurrency: int = LIST_CONCURRENCY
+) -> list:
+    """
+    List every file by fetching the remaining pages concurrently
+    
+    Args:
+        host: Host connected to the Files server
+        authorization: Authorization header value for the Files API
+        first_page: The first page, if it has already been fetched
+        page_size: Number of files per page
+        concurrency: Maximum number of pages requested at once
+    
+    Returns:
+        The files of every page, in order
+    """
+    # The first page tells how many files there are in total
+    if first_page is None:
+        first_page = await host.call_tool(
+            "files", "list_files", list_files_args(authorization, 0, page_size)
         )
+    files = list(first_page.get("data") or [])
+    total = first_page.get("meta", {}).get("results", {}).get("total", len(files))
+    
+    semaphore = asyncio.Semaphore(concurrency)
+    
+    async def fetch_page(offset: int) -> list:
+        async with semaphore:
+            page = await host.call_tool(
+                "files", "list_files", list_files_args(authorization, offset, page_size)
+            )
+        return page.get("data") or []
+    
+    # gather keeps the pages in offset order
+    pages = await asyncio.gather(
+        *(fetch_page(offset) for offset in range(len(files), total, page_size))
+    )
+    for page in pages:
+        files.extend(page)
+    return files
+
+
+def stdio_server(script: str) -> StdioServerParameters:
+    """Build the parameters that start one of the servers over stdio"""
+    # Run the server with this interpreter, and hand it the environment
+    # loaded from .env; stdio_client only passes a minimal default one
+    return StdioServerParameters(
+        command=sys.executable,
+        args=[script],
+        env=dict(os.environ)
+    )
+
+
+async def build_clients(host: MCPHost, transport: str, need_auth: bool = True) -> None:
+    """
+    Connect the host to the auth and Files servers
+    
+    Args:
+        host: Host to register the server sessions with
+        transport: "inproc" to call the servers' tools in this process, or
+            "stdio" to start them as subprocesses and talk to them over stdio
+        need_auth: Whether the auth server will be called at all
+    """
+    if transport == "inproc":
+        from src import mcp_server, mcp_server_auth
         
-        # Print the results
-        files_data = response.result
-        print(f"Found {len(files_data.get('data', []))} files:")
-        for i, file in enumerate(files_data.get('data', []), 1):
-            print(f"{i}. {file.get('name')} ({file.get('id')})")
-        
-        # Check if we got 6 files
-        file_count = len(files_data.get('data', []))
-        if file_count == 6:
-            print("\n✅ TEST PASSED: Found exactly 6 files as expected")
-        else:
-            print(f"\n❌ TEST FAILED: Expected 6 files but found {file_count}")
+        host.attach("files", mcp_server.mcp, mcp_server.shutdown)
+        host.attach("auth", mcp_server_auth.mcp, mcp_server_auth.shutdown)
+        return
+    
+    if transport != "stdio":
+        raise ValueError(f"Unknown MCP transport: {transport!r}")
+    
+    # Start the servers at once so the Files server boots while the auth
+    # server does, instead of after the token is validated
+    servers = [host.connect("files", stdio_server(FILES_SERVER_SCRIPT))]
+    if need_auth:
+        servers.append(host.connect("auth", stdio_server(AUTH_SERVER_SCRIPT)))
+    await asyncio.gather(*servers)
+
+
+async def run_mcp_client_test(transport: str = TRANSPORT):
+    """
+    Run a test of the Elastic Path Files and Auth MCP clients
+    
+    Args:
+        transport: How to reach the servers, "inproc" or "stdio"
+    """
+    print("\n=== Testing Elastic Path MCP Clients ===\n")
+    
+    async with MCPHost() as host:
+        try:
+            # A token cached by a previous run makes the auth server unnecessary
+            cached_token = load_cached_token()
+            await build_clients(host, transport, need_auth=cached_token is None)
+            
+            print("\n--- STEP 1: Obtain Authentication Token ---")
+            
+            files_data = None
+            if cached_token is not None:
+                token = cached_token["access_token"]
+                expires_in = int(cached_token["expires_at"] - time.time())
+                print(f"✅ Reusing cached access token from {TOKEN_CACHE_PATH}")
+                print(f"Expires in: {expires_in} seconds")
+                
+                print("\n--- STEP 2: Use Token with Files API ---")
+                
+                # List files
+                print("\n--- Listing Files ---")
+                authorization = f"Bearer {token}"
+                try:
+                    files_data = await host.call_tool(
+                        "files", "list_files", list_files_args(authorization, 0)
+                    )
+                except RuntimeError as e:
+                    # A revoked token would otherwise keep failing every run
+                    # until it expires, so drop it and get a new one
+                    print(f"❌ Cached access token was rejected: {e}")
+                    clear_cached_token()
+                    if "auth" not in host.sessions:
+                        await host.connect("auth", stdio_server(AUTH_SERVER_SCRIPT))
+                    print("\n--- STEP 1: Obtain a New Authentication Token ---")
+            
+            if files_data is None:
+                # Get a token using client credentials
+                token_data = await host.call_tool(
+                    "auth",
+                    "get_client_credentials_token",
+                    {
+                        "base_url": BASE_URL,
+                        "client_id": CLIENT_ID,
+                        "client_secret": CLIENT_SECRET,
+                        # The server's own cache may hold the rejected token
+                        "force_refresh": cached_token is not None,
+                    }
+                )
+                
+                token = token_data.get("access_token")
+                
+                if not token:
+                    print("❌ ERROR: Failed to obtain access token")
+                    return
+                    
+                expires_in = token_data.get("expires_in")
+                token_type = token_data.get("token_type", "bearer")
+                cached = token_data.get("cached", False)
+                
+                print(f"✅ Successfully obtained access token")
+                print(f"Token type: {token_type}")
+                shown_expires_in = expires_in if expires_in is not None else "unknown"
+                print(f"Expires in: {shown_expires_in} seconds")
+                print(f"Cached: {cached}")
+                
+                print("\n--- STEP 2: Use Token with Files API ---")
+                
+                # List files
+                print("\n--- Listing Files ---")
+                authorization = f"Bearer {token}"
+                
+                # Optional: validate the token while the first page is listed,
+                # and only act on the listing once validation has passed
+                validation, files_data = await asyncio.gather(
+                    host.call_tool(
+                        "auth",
+                        "validate_token",
+                        {"token": token, "base_url": BASE_URL}
+                    ),
+                    host.call_tool(
+                        "files", "list_files", list_files_args(authorization, 0)
+                    ),
+                    return_exceptions=True
+                )
+                if isinstance(validation, BaseException):
+                    raise validation
+                
+                if validation.get("valid"):
+                    print("✅ Token validation successful")
+                else:
+                    print(f"❌ Token validation failed: {validation.get('message')}")
+                    return
+                
+                save_cached_token(token, expires_in if expires_in is not None else 3600)
+                
+                if isinstance(files_data, BaseException):
+                    raise files_data
+            
+            # Fetch the remaining pages, if any, so every file is counted
+            files = await list_all_files(host, authorization, files_data)
+            
+            # Print the results
+            print(f"Found {len(files)} files:")
+            # One write for the whole listing instead of a print per file
+            sys.stdout.write("".join(
+                f"{i}. {file.get('name')} ({file.get('id')})\n"
+                for i, file in enumerate(files, 1)
+            ))
             
-    except Exception as e:
-        print(f"Error during test: {str(e)}")
-        import traceback
-        traceback.print_exc()
+            # Check if we got 6 files
+            file_count = len(files)
+            if file_count == 6:
+                print("\n✅ TEST PASSED: Found exactly 6 files as expected")
+            else:
+                print(f"\n❌ TEST FAILED: Expected 6 files but found {file_count}")
+                
+        except Exception as e:
+            print(f"Error during test: {str(e)}")
+            import traceback
+            traceback.print_exc()
+
+
+def run_test(transport: str = TRANSPORT) -> None:
+    """
+    Run the client test to completion from synchronous code
+    
+    Uses uvloop when it is installed. A loop cannot be run from inside a running
+    one (Jupyter, async test harnesses), so in that case the test gets its own
+    loop on a worker thread.
+    """
+    try:
+        import uvloop
+    except ImportError:  # uvloop is not available on Windows
+        run = asyncio.run
+    else:
+        run = uvloop.run
+    
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        loop_running = False
+    else:
+        loop_running = True
+    
+    # Run outside the except block, so test tracebacks are not chained to
+    # the "no running event loop" error
+    if not loop_running:
+        run(run_mcp_client_test(transport))
+        return
+    
+    with concurrent.futures.ThreadPoolExecutor(max_workers=1) as executor:
+        executor.submit(run, run_mcp_client_test(transport)).result()
+
 
 if __name__ == "__main__":
-    asyncio.run(run_mcp_client_test())
\ No newline at end of file
+    # --integration is shorthand for MCP_TRANSPORT=stdio
+    run_test("stdio" if "--integration" in sys.argv[1:] else TRANSPORT)
\ No newline at end of file